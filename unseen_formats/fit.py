@@ -1,7 +1,5 @@
 import csv
 import numpy as np
-from scipy.optimize import curve_fit
-import matplotlib.pyplot as plt
 
 # Define the logarithmic model function
 # Note: np.log() is the natural logarithm (ln)
@@ -12,16 +10,76 @@ def log_func(x, a, b):
   # Ensure x is positive to avoid math domain errors
   return a * np.log(x) + b
 
-def generate_fit(x_data, y_data, min_x=None, max_x=None, steps=100):
+def _eval_band(x_fit, a, b, c00, c01, c11, conf_factor):
+  """
+  Evaluate the fitted curve y = a * ln(x) + b and its confidence band at x_fit,
+  given the parameter covariance terms. Returns y_fit, y_lower, y_upper.
+  """
+  log_x = np.log(x_fit)
+  y_fit = log_x * a
+  y_fit += b
+  # Var(y) = c00*ln(x)² + 2*c01*ln(x) + c11, evaluated in-place in Horner form:
+  band = log_x * c00
+  band += 2 * c01
+  band *= log_x
+  band += c11
+  np.sqrt(band, out=band)
+  band *= conf_factor
+  y_lower = y_fit - band
+  y_upper = np.add(y_fit, band, out=band)
+  return y_fit, y_lower, y_upper
+
+def generate_fit(x_data, y_data, min_x=None, max_x=None, steps=100, ftol=1e-5, xtol=1e-5, method='polyfit'):
+  x_data = np.asarray(x_data, dtype=np.float64)
+  y_data = np.asarray(y_data, dtype=np.float64)
   if not min_x:
     min_x = min(x_data)
   if not max_x:
     max_x = max(x_data)
 
+  # The log of the data does not change, so compute it once:
+  log_x_data = np.log(x_data)
+
+  # The fits skip SciPy's own finite check, so check here (this also catches x <= 0):
+  if not (np.isfinite(log_x_data).all() and np.isfinite(y_data).all()):
+    raise ValueError("x_data must be positive and finite, and y_data finite, to fit y = a * ln(x) + b")
+
+  # With only two points there are no residuals to scale the covariance by, which
+  # polyfit refuses to do. curve_fit instead warns and returns an infinite covariance,
+  # so fall back to that:
+  if method == 'polyfit' and x_data.size <= 2:
+    method = 'curve_fit'
+
   # Fit the model to the data
   # popt: optimal parameters [a, b]
   # pcov: estimated covariance of popt
-  popt, pcov = curve_fit(log_func, x_data, y_data)
+  if method == 'polyfit':
+    # The model is linear in ln(x), so this is just a straight line fit to the
+    # log of the data, which can be solved directly rather than iteratively.
+    # As with curve_fit, the covariance is scaled by the residuals.
+    popt, pcov = np.polyfit(log_x_data, y_data, 1, cov=True)
+  elif method == 'curve_fit':
+    # SciPy is only needed for this path, so only import it here:
+    from scipy.optimize import curve_fit
+
+    # Use the log of the data for both the model and its (analytic) Jacobian.
+    # The Jacobian [ln(x), 1] does not depend on the parameters, so is only built once:
+    J = np.empty((log_x_data.size, 2))
+    J[:, 0] = log_x_data
+    J[:, 1] = 1.0
+
+    def _log_func(x, a, b):
+      return a * log_x_data + b
+
+    def _log_jac(x, a, b):
+      return J
+
+    # The counts are noisy and already known to be finite, so skip the finite check
+    # and stop iterating well before the default (1e-8) tolerances:
+    popt, pcov = curve_fit(_log_func, x_data, y_data, jac=_log_jac, method='lm',
+                           check_finite=False, ftol=ftol, xtol=xtol)
+  else:
+    raise ValueError(f"Unknown fit method: '{method}'")
 
   # Extract the optimal parameters
   a_opt, b_opt = popt
@@ -37,14 +95,10 @@ def generate_fit(x_data, y_data, min_x=None, max_x=None, steps=100):
   # To get the uncertainty of the fitted curve, we must propagate the error.
   # The variance of the function y = a*ln(x) + b is given by:
   # Var(y) = (∂y/∂a)²σₐ² + (∂y/∂b)²σᵦ² + 2(∂y/∂a)(∂y/∂b)σₐᵦ
-  # This can be computed elegantly using the Jacobian and covariance matrix.
-  # Jacobian matrix J = [[∂y/∂a], [∂y/∂b]] = [[ln(x)], [1]]
-  J = np.array([np.log(x_fit), np.ones(len(x_fit))]).T
-
-  # The variance of the fit at each x_fit point
-  # Var(y_fit) = J @ pcov @ J.T
-  var_y_fit = np.sum(J @ pcov * J, axis=1)
-  std_dev_y_fit = np.sqrt(var_y_fit)
+  # This is the diagonal of J @ pcov @ J.T, with the Jacobian J = [[ln(x)], [1]].
+  # As J only has two columns, the quadratic form can be expanded directly rather
+  # than building the N×2 Jacobian and multiplying it out:
+  # Var(y_fit) = σₐ²ln(x)² + 2σₐᵦln(x) + σᵦ²
 
   # Confidence interval factor (1.96 for 95% confidence)
   # For a more rigorous approach with small sample sizes, use the t-distribution
@@ -52,38 +106,43 @@ def generate_fit(x_data, y_data, min_x=None, max_x=None, steps=100):
   # t_val = t.ppf(1 - 0.05 / 2, len(x_data) - len(popt))
   conf_factor = 1.96
 
-  # Calculate the upper and lower confidence bounds
-  y_fit = log_func(x_fit, a_opt, b_opt)
-  y_upper = y_fit + conf_factor * std_dev_y_fit
-  y_lower = y_fit - conf_factor * std_dev_y_fit
+  # Calculate the fitted curve and the upper and lower confidence bounds together:
+  y_fit, y_lower, y_upper = _eval_band(x_fit, a_opt, b_opt, pcov[0, 0], pcov[0, 1], pcov[1, 1], conf_factor)
 
   return x_fit, y_fit, a_opt, b_opt, y_lower, y_upper
 
 
 def generate_fit_plot(x_data, y_data, labels, x_fit, y_fit, a_opt, b_opt, y_lower, y_upper, prefix="out"):
-
-  plt.figure(figsize=(12, 7))
-
-  # Plot the original data
-  fig, ax = plt.subplots()
-  for i in range(len(x_data)):
-    ax.scatter(x_data[i], y_data[i], label=labels[i], s=20)
+  # Only import matplotlib when actually plotting, as it is slow to import.
+  # The plot is only ever saved to files, so a bare Figure is used rather than pyplot,
+  # which avoids loading and probing for an interactive backend:
+  from matplotlib.figure import Figure
+  from matplotlib.lines import Line2D
+
+  # Plot the original data, as a single collection coloured per point using the default colour cycle:
+  fig = Figure(figsize=(12, 7))
+  ax = fig.subplots()
+  colors = [f"C{i}" for i in range(len(labels))]
+  ax.scatter(np.asarray(x_data, dtype=np.float64), np.asarray(y_data, dtype=np.float64), c=colors, s=20)
 
   # Set the limits
   ax.set_xlim([0, 50000])
   ax.set_ylim([0, 14000])
 
   # Plot the fitted curve
-  plt.plot(x_fit, y_fit, 'r-', label=f'Fit: y = {a_opt:.2f}ln(x) + {b_opt:.2f}')
+  ax.plot(x_fit, y_fit, 'r-', label=f'Fit: y = {a_opt:.2f}ln(x) + {b_opt:.2f}')
 
   # Plot the 95% confidence interval
-  plt.fill_between(x_fit, y_lower, y_upper, color='red', alpha=0.2, label='95% Confidence Interval')
+  ax.fill_between(x_fit, y_lower, y_upper, color='red', alpha=0.2, label='95% Confidence Interval')
 
   # Final plot styling
-  plt.xlabel('Total File Extensions Recorded', fontsize=10)
-  plt.ylabel('Total Unique File Extensions', fontsize=10)
-  plt.legend(fontsize=9)
-  plt.grid(True, linestyle='--', alpha=0.6)
+  ax.set_xlabel('Total File Extensions Recorded', fontsize=10)
+  ax.set_ylabel('Total Unique File Extensions', fontsize=10)
+  # The points need their own legend entries, ahead of the fit ones:
+  handles = [Line2D([], [], marker='o', linestyle='', color=color, label=label) for color, label in zip(colors, labels)]
+  handles += ax.get_legend_handles_labels()[0]
+  ax.legend(handles=handles, fontsize=9)
+  ax.grid(True, linestyle='--', alpha=0.6)
   #plt.show()
-  plt.savefig(f"{prefix}.plot.png", dpi=300)
-  plt.savefig(f"{prefix}.plot.svg")
\ No newline at end of file
+  fig.savefig(f"{prefix}.plot.png", dpi=300)
+  fig.savefig(f"{prefix}.plot.svg")
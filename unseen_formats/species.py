@@ -1,13 +1,24 @@
 # Use the idea of a Species Accumulation Curve to understand the scale of the format challenge.
+import os
 import csv
+import sys
 import yaml
 import json
+import orjson
 import logging
 import argparse
+import numpy as np
 from collections import defaultdict
+from functools import lru_cache
 from pathlib import Path
 from .fit import generate_fit, generate_fit_plot
 
+# Use the libyaml-based loader if PyYAML was built with it, as it is much faster:
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s: %(levelname)s - %(name)s - %(message)s')
 
 logger = logging.getLogger(__name__)
@@ -15,7 +26,7 @@ logger = logging.getLogger(__name__)
 
 def load_extensions_yaml(input_file):
     with open(input_file) as f:
-        extensions = yaml.safe_load(f)
+        extensions = yaml.load(f, Loader=SafeLoader)
     return extensions
 
 def reindex_yaml_by_registry(extensions):
@@ -23,20 +34,20 @@ def reindex_yaml_by_registry(extensions):
     ext_sets = defaultdict(set)
     for ext in exts:
         for id in exts[ext]['identifiers']:
-            ext_sets[id['regId']].add(ext.lower())
+            ext_sets[id['regId']].add(sys.intern(ext.lower()))
     return ext_sets
 
-def load_extensions(input_file):
+def _load_extensions_impl(input_file):
     if input_file.endswith('yml') or input_file.endswith('yaml'):
         extensions = load_extensions_yaml(input_file)
         return reindex_yaml_by_registry(extensions)
     elif input_file.endswith('jsonl'):
         # Assume this is the new (2025-09) `registries.jsonl' format:
         ext_sets = {}
-        with open(input_file) as f:
+        with open(input_file, 'rb') as f:
             for line in f:
-                reg = json.loads(line)
-                ext_sets[reg['id']] = set(reg['extensions'])
+                reg = orjson.loads(line)
+                ext_sets[reg['id']] = set(map(sys.intern, reg['extensions']))
         # And return:
         return ext_sets
     else:
@@ -44,42 +55,65 @@ def load_extensions(input_file):
             ext_sets = json.load(f)
             # Convert to a Dict of Sets:
             for source, ext_list in ext_sets.items():
-                ext_sets[source] = set(ext_list)
+                ext_sets[source] = set(map(sys.intern, ext_list))
 
             return ext_sets
 
-def compute_sac(ext_sets):
+@lru_cache(maxsize=4)
+def _load_extensions_cached(input_file, mtime_ns, size):
+    # The modification time and size are only part of the cache key, so a changed file gets re-parsed.
+    # The cached sets are shared with every caller, so freeze them (and drop any defaultdict):
+    return {source: frozenset(ext_set) for source, ext_set in _load_extensions_impl(input_file).items()}
 
-    all_extensions = set()
-    sample_total = 0
-    results = []
+def load_extensions(input_file):
+    # Parsing is the slow part, so re-use the result if the same (unchanged) file is loaded again.
+    # The sets are shared frozensets, but each caller gets its own dict of them:
+    st = os.stat(input_file)
+    return dict(_load_extensions_cached(input_file, st.st_mtime_ns, st.st_size))
+
+def compute_sac(ext_sets):
 
     # Go though the dict of sets, sorting them so largest sets go first (note each item is the k,v array):
     # Doing this seems to make the curve fitting more robust/consistent.
-    for set_key, ext_set in sorted(ext_sets.items(), key=lambda item: len(item[1]), reverse=True):
-        sample_total += len(ext_set)
-        current_total = len(all_extensions)
+    items = sorted(ext_sets.items(), key=lambda item: len(item[1]), reverse=True)
+
+    # Only the set operations need doing one set at a time. Keep a running union of the sets so far,
+    # and collect any extension that had already been seen, as that appears in more than one set:
+    sorted_sets = [ext_set for _, ext_set in items]
+    all_extensions = set()
+    shared = set()
+    total_uniq = []
+    for ext_set in sorted_sets:
+        shared |= ext_set & all_extensions
         all_extensions |= ext_set
-        total_added = len(all_extensions) - current_total
-        # Calculate the unique part, by making a copy of the set and removing all other sets from it:
-        unique_ext = ext_set.copy()
-        for other_set in ext_sets:
-            if other_set != set_key:
-                unique_ext -= ext_sets[other_set]
-        # Share & Enjoy:
-        set_size = len(ext_set)
-        unique_size = len(unique_ext)
-        result = {
+        total_uniq.append(len(all_extensions))
+
+    # Calculate the unique part, i.e. the extensions that appear in no other set:
+    unique_exts = [list(ext_set - shared) for ext_set in sorted_sets]
+
+    # The rest of the statistics can then be calculated for all sets at once:
+    sizes = np.array([len(ext_set) for _, ext_set in items], dtype=np.int64)
+    uniq_sizes = np.array([len(unique_ext) for unique_ext in unique_exts], dtype=np.int64)
+    total_uniq = np.array(total_uniq, dtype=np.int64)
+    total_exts = np.cumsum(sizes)
+    added_uniq = np.diff(total_uniq, prepend=0)
+    # A registry with no extensions has none that are unique, so report that as 0%:
+    percent_uniq = np.divide(100.0 * uniq_sizes, sizes, out=np.zeros(len(sizes)), where=sizes > 0)
+
+    # Share & Enjoy:
+    results = [
+        {
             "source": set_key,
-            "num_exts": set_size,
-            "num_uniq_exts": unique_size,
-            "percent_uniq_exts": 100.0*unique_size/set_size,
-            "total_exts": sample_total,
-            "total_uniq_exts": len(all_extensions),
-            "added_uniq_exts": total_added,
-            "uniq_exts": list(unique_ext)
+            "num_exts": int(sizes[i]),
+            "num_uniq_exts": int(uniq_sizes[i]),
+            "percent_uniq_exts": float(percent_uniq[i]),
+            "total_exts": int(total_exts[i]),
+            "total_uniq_exts": int(total_uniq[i]),
+            "added_uniq_exts": int(added_uniq[i]),
+            "uniq_exts": unique_exts[i]
         }
-        results.append(result)
+        for i, (set_key, _) in enumerate(items)
+    ]
 
     return results
 
@@ -88,11 +122,12 @@ def write_sac(input_file):
     results = compute_sac(ext_sets)
     # Write out as CSV:
     output_csv = Path(input_file).with_suffix('.species.csv') 
-    with open(output_csv, 'w') as csvfile:
+    # (with the list of unique extensions written as a single '|'-delimited field)
+    rows = [{**item, "uniq_exts": "|".join(item["uniq_exts"])} for item in results]
+    with open(output_csv, 'w', newline='', buffering=1 << 20) as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=results[0].keys())
         writer.writeheader()
-        for item in results:
-            writer.writerow(item)
+        writer.writerows(rows)
     # Also run the fit
     x_data = []
     y_data = []
@@ -106,18 +141,16 @@ def write_sac(input_file):
     generate_fit_plot(x_data, y_data, labels, x_fit, y_fit, a_opt, b_opt, y_lower, y_upper, prefix)
 
 
-def _print_comparison(set_key, candidate_set, collection_set, collection_counts, collection_total):
+def _print_comparison(set_key, candidate_set, collection_set, collection_counts, collection_index, collection_total):
     remainder = collection_set - candidate_set
     common = collection_set.intersection(candidate_set)
-    remainder_count = 0
-    for ext in remainder:
-        remainder_count += collection_counts[ext]
+    remainder_count = int(collection_counts[[collection_index[ext] for ext in remainder]].sum())
     print(f"{set_key} {len(common)} {len(remainder)} {remainder_count} {collection_total}")# {json.dumps(list(remainder))}")
 
 def compare_csv(input_file, csv_file):
     collection_set = set()
-    collection_counts = {}
-    collection_total = 0
+    collection_exts = []
+    collection_counts = []
     with open(csv_file) as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
@@ -130,24 +163,31 @@ def compare_csv(input_file, csv_file):
             if ext.isnumeric():
                 logger.warning(f"Dropping extension that appears to be just a number: '{ext}'")
                 continue
-            # Convert to standard lower-case glob format
-            ext = f"*.{ext}"
-            logger.debug(f"Found extension {ext} with file_count {row['file_count']}")
+            # Convert to standard lower-case glob format (interned, like the registry extensions)
+            ext = sys.intern(f"*.{ext}")
+            file_count = int(row['file_count'])
+            logger.debug(f"Found extension {ext} with file_count {file_count}")
             collection_set.add(ext)
-            collection_counts[ext] = int(row['file_count'])
-            collection_total += int(row['file_count'])
-    
+            collection_exts.append(ext)
+            collection_counts.append(file_count)
+    # Hold the counts in an array, indexed by an extension-to-position map (the last row wins for any repeats):
+    collection_counts = np.asarray(collection_counts, dtype=np.int64)
+    collection_index = {ext: i for i, ext in enumerate(collection_exts)}
+    collection_total = int(collection_counts.sum())
+
     ext_sets = load_extensions(input_file)
     all_extensions = set()
     for set_key, ext_set in sorted(ext_sets.items(), key=lambda item: len(item[1]), reverse=True):
         all_extensions |= ext_set
-        _print_comparison(set_key, ext_set, collection_set, collection_counts, collection_total)
-    _print_comparison("_ALL_", all_extensions, collection_set, collection_counts, collection_total)
+        _print_comparison(set_key, ext_set, collection_set, collection_counts, collection_index, collection_total)
+    _print_comparison("_ALL_", all_extensions, collection_set, collection_counts, collection_index, collection_total)
 
 def write_extensions(input_file, output_json):
     ext_sets = load_extensions(input_file)
-    with open(output_json,"w") as f:
-        json.dump(ext_sets, f, default=list)
+    # Sort the extensions so the output is stable and easy to diff:
+    payload = {source: sorted(ext_set) for source, ext_set in ext_sets.items()}
+    with open(output_json,"wb") as f:
+        f.write(orjson.dumps(payload))
 
 
 if __name__ == "__main__":